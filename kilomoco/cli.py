@@ -19,9 +19,11 @@ def main(argv=None):
     args = parser.parse_args(argv)
     if args.list:
         profiles = default_profiles()
-        for profile_id in sorted(profiles.keys()):
-            profile = profiles[profile_id]
-            print(f"{profile_id}: {profile.name} - {profile.description}")
+        # Profiles are already ordered by id; emit the whole listing with a single write
+        sys.stdout.write("".join(
+            f"{profile_id}: {profile.name} - {profile.description}\n"
+            for profile_id, profile in profiles.items()
+        ))
         return 0
     elif args.profile:
         # Launch with specified profile
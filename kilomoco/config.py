@@ -1,156 +1,188 @@
 """Configuration model and simple persistence helpers for kilomoco."""
-from dataclasses import dataclass, asdict
-from typing import Dict, Optional
+from dataclasses import dataclass, fields, replace
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+import functools
 import json
 import os
+import sys
 import warnings
 from pathlib import Path
-import yaml
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ModeCombinationProfile:
     id: str
     name: str
     description: str
     modes: Dict[str, str]  # mode_name -> model_name
 
-def default_profiles() -> Dict[str, ModeCombinationProfile]:
+# Field names resolved once; avoids asdict()'s per-call fields() walk and deepcopy
+_PROFILE_FIELDS = tuple(f.name for f in fields(ModeCombinationProfile))
+
+def _profile_to_dict(profile: ModeCombinationProfile) -> Dict[str, object]:
+    return {name: getattr(profile, name) for name in _PROFILE_FIELDS}
+
+def _intern_modes(modes: Dict[str, str]) -> Dict[str, str]:
+    """Return modes with interned mode and model names, so repeated names share one object."""
+    return {
+        sys.intern(mode) if isinstance(mode, str) else mode: sys.intern(model) if isinstance(model, str) else model
+        for mode, model in modes.items()
+    }
+
+def _freeze_profiles(profiles: Dict[str, ModeCombinationProfile]) -> Mapping[str, ModeCombinationProfile]:
+    """Return a read-only copy of profiles, ordered by id, with interned modes."""
+    return MappingProxyType({
+        profile_id: replace(profile, modes=_intern_modes(profile.modes))
+        for profile_id, profile in sorted(profiles.items())
+    })
+
+# Built-in profiles, used when no YAML profiles are discovered.
+_BUILTIN_PROFILES = _freeze_profiles({
+    "lopr": ModeCombinationProfile(
+        id="lopr",
+        name="Low-Price (Economy)",
+        description="Budget-friendly model combinations for cost-conscious usage",
+        modes={
+            "default": "llama-4-maverick",
+            "orchestrator": "deepseek-v3.2-exp",
+            "architect": "minimax-m2",
+            "code": "minimax-m2",
+            "debug": "deepseek-v3.1-terminus",
+            "ask": "llama-4-maverick",
+            "administrator": "deepseek-v3.2-exp"
+        }
+    ),
+    "copr": ModeCombinationProfile(
+        id="copr",
+        name="Complex-Programming (Agentic Coding)",
+        description="Optimized for complex programming tasks and agentic workflows",
+        modes={
+            "default": "gpt-5-mini",
+            "orchestrator": "claude-sonnet-4.5",
+            "architect": "gemini-2.5-pro",
+            "code": "qwen3-coder",
+            "debug": "claude-haiku-4.5",
+            "ask": "glm-4.6",
+            "administrator": "glm-4.6"
+        }
+    ),
+    "hiq": ModeCombinationProfile(
+        id="hiq",
+        name="High-Quality (Premium)",
+        description="Premium models for highest quality output",
+        modes={
+            "default": "gemini-2.5-pro",
+            "orchestrator": "claude-sonnet-4.5",
+            "architect": "gpt-5",
+            "code": "claude-sonnet-4.5",
+            "debug": "claude-sonnet-4.5",
+            "ask": "gemini-2.5-pro",
+            "administrator": "gpt-5"
+        }
+    ),
+    "bas": ModeCombinationProfile(
+        id="bas",
+        name="Balanced-Speed (speed)",
+        description="Balanced performance with good speed",
+        modes={
+            "default": "grok-code-fast-1",
+            "orchestrator": "gemini-2.5-flash",
+            "architect": "gpt-5-mini",
+            "code": "grok-code-fast-1",
+            "debug": "gemini-2.5-flash",
+            "ask": "grok-code-fast-1",
+            "administrator": "gemini-2.5-flash"
+        }
+    ),
+    "res": ModeCombinationProfile(
+        id="res",
+        name="Repository-Scale (big codebases)",
+        description="Optimized for large codebases and repository-scale tasks",
+        modes={
+            "default": "gemini-2.5-flash",
+            "orchestrator": "gemini-2.5-pro",
+            "architect": "qwen3-max",
+            "code": "qwen3-coder",
+            "debug": "glm-4.6",
+            "ask": "llama-4-maverick",
+            "administrator": "qwen3-max"
+        }
+    ),
+    "ags": ModeCombinationProfile(
+        id="ags",
+        name="Agent-Specialist (Autonome Workflows)",
+        description="Specialized for autonomous workflows and agent operations",
+        modes={
+            "default": "minimax-m2",
+            "orchestrator": "claude-sonnet-4.5",
+            "architect": "deepseek-v3.1-terminus",
+            "code": "glm-4.6",
+            "debug": "claude-haiku-4.5",
+            "ask": "gpt-5-mini",
+            "administrator": "deepseek-v3.1-terminus"
+        }
+    ),
+    "refo": ModeCombinationProfile(
+        id="refo",
+        name="Research-Focused (analyse & science)",
+        description="Optimized for research, analysis, and scientific tasks",
+        modes={
+            "default": "qwen3-max",
+            "orchestrator": "gemini-2.5-pro",
+            "architect": "gpt-5",
+            "code": "mistral-large",
+            "debug": "claude-sonnet-4.5",
+            "ask": "gemini-2.5-flash",
+            "administrator": "mistral-large"
+        }
+    ),
+    "buco": ModeCombinationProfile(
+        id="buco",
+        name="Budget-Conscious-Pro (budget and efficiency)",
+        description="Professional quality with budget consciousness",
+        modes={
+            "default": "gemini-2.5-flash",
+            "orchestrator": "gpt-5-mini",
+            "architect": "qwen3-coder",
+            "code": "grok-code-fast-1",
+            "debug": "claude-haiku-4.5",
+            "ask": "deepseek-v3.2-exp",
+            "administrator": "minimax-m2"
+        }
+    )
+})
+
+@functools.lru_cache(maxsize=1)
+def default_profiles() -> Mapping[str, ModeCombinationProfile]:
     """Return the default mode combination profiles.
 
     First attempts to discover profiles from YAML files in candidate directories.
-    If no YAML profiles are found, falls back to built-in profiles.
+    If no YAML profiles are found, falls back to the read-only built-in profiles.
+
+    The result is cached for the lifetime of the process; call
+    clear_profile_caches() to force a re-discovery.
     """
     discovered = discover_profiles()
     if discovered:
         return discovered
     # Fallback to built-in profiles
-    return {
-        "lopr": ModeCombinationProfile(
-            id="lopr",
-            name="Low-Price (Economy)",
-            description="Budget-friendly model combinations for cost-conscious usage",
-            modes={
-                "default": "llama-4-maverick",
-                "orchestrator": "deepseek-v3.2-exp",
-                "architect": "minimax-m2",
-                "code": "minimax-m2",
-                "debug": "deepseek-v3.1-terminus",
-                "ask": "llama-4-maverick",
-                "administrator": "deepseek-v3.2-exp"
-            }
-        ),
-        "copr": ModeCombinationProfile(
-            id="copr",
-            name="Complex-Programming (Agentic Coding)",
-            description="Optimized for complex programming tasks and agentic workflows",
-            modes={
-                "default": "gpt-5-mini",
-                "orchestrator": "claude-sonnet-4.5",
-                "architect": "gemini-2.5-pro",
-                "code": "qwen3-coder",
-                "debug": "claude-haiku-4.5",
-                "ask": "glm-4.6",
-                "administrator": "glm-4.6"
-            }
-        ),
-        "hiq": ModeCombinationProfile(
-            id="hiq",
-            name="High-Quality (Premium)",
-            description="Premium models for highest quality output",
-            modes={
-                "default": "gemini-2.5-pro",
-                "orchestrator": "claude-sonnet-4.5",
-                "architect": "gpt-5",
-                "code": "claude-sonnet-4.5",
-                "debug": "claude-sonnet-4.5",
-                "ask": "gemini-2.5-pro",
-                "administrator": "gpt-5"
-            }
-        ),
-        "bas": ModeCombinationProfile(
-            id="bas",
-            name="Balanced-Speed (speed)",
-            description="Balanced performance with good speed",
-            modes={
-                "default": "grok-code-fast-1",
-                "orchestrator": "gemini-2.5-flash",
-                "architect": "gpt-5-mini",
-                "code": "grok-code-fast-1",
-                "debug": "gemini-2.5-flash",
-                "ask": "grok-code-fast-1",
-                "administrator": "gemini-2.5-flash"
-            }
-        ),
-        "res": ModeCombinationProfile(
-            id="res",
-            name="Repository-Scale (big codebases)",
-            description="Optimized for large codebases and repository-scale tasks",
-            modes={
-                "default": "gemini-2.5-flash",
-                "orchestrator": "gemini-2.5-pro",
-                "architect": "qwen3-max",
-                "code": "qwen3-coder",
-                "debug": "glm-4.6",
-                "ask": "llama-4-maverick",
-                "administrator": "qwen3-max"
-            }
-        ),
-        "ags": ModeCombinationProfile(
-            id="ags",
-            name="Agent-Specialist (Autonome Workflows)",
-            description="Specialized for autonomous workflows and agent operations",
-            modes={
-                "default": "minimax-m2",
-                "orchestrator": "claude-sonnet-4.5",
-                "architect": "deepseek-v3.1-terminus",
-                "code": "glm-4.6",
-                "debug": "claude-haiku-4.5",
-                "ask": "gpt-5-mini",
-                "administrator": "deepseek-v3.1-terminus"
-            }
-        ),
-        "refo": ModeCombinationProfile(
-            id="refo",
-            name="Research-Focused (analyse & science)",
-            description="Optimized for research, analysis, and scientific tasks",
-            modes={
-                "default": "qwen3-max",
-                "orchestrator": "gemini-2.5-pro",
-                "architect": "gpt-5",
-                "code": "mistral-large",
-                "debug": "claude-sonnet-4.5",
-                "ask": "gemini-2.5-flash",
-                "administrator": "mistral-large"
-            }
-        ),
-        "buco": ModeCombinationProfile(
-            id="buco",
-            name="Budget-Conscious-Pro (budget and efficiency)",
-            description="Professional quality with budget consciousness",
-            modes={
-                "default": "gemini-2.5-flash",
-                "orchestrator": "gpt-5-mini",
-                "architect": "qwen3-coder",
-                "code": "grok-code-fast-1",
-                "debug": "claude-haiku-4.5",
-                "ask": "deepseek-v3.2-exp",
-                "administrator": "minimax-m2"
-            }
-        )
-    }
+    return _BUILTIN_PROFILES
 
 def load_profiles_from_file(path: str) -> Dict[str, ModeCombinationProfile]:
     p = Path(path)
     if not p.exists():
         return {}
-    data = json.loads(p.read_text(encoding="utf-8"))
+    data = json.loads(p.read_bytes())
     return {k: ModeCombinationProfile(**v) for k, v in data.items()}
 
-def save_profiles_to_file(profiles: Dict[str, ModeCombinationProfile], path: str) -> None:
-    p = Path(path)
-    p.write_text(json.dumps({k: asdict(v) for k, v in profiles.items()}, indent=2), encoding="utf-8")
+def save_profiles_to_file(profiles: Mapping[str, ModeCombinationProfile], path: str) -> None:
+    # json.dump streams iterencode() chunks through the file buffer, so the
+    # full JSON text is never held in memory at once
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: _profile_to_dict(v) for k, v in profiles.items()}, f, indent=2)
 
 
+@functools.lru_cache(maxsize=1)
 def profiles_dir_candidates() -> list[str]:
     """Return candidate directories for profiles in priority order.
 
@@ -159,28 +191,61 @@ def profiles_dir_candidates() -> list[str]:
     2. ./profiles subdirectory in current working directory
     3. ~/.kilomoco/profiles user config directory
 
-    Only returns directories that exist.
+    Only returns directories that exist. The result is cached, so changes to
+    KILOMOCO_PROFILES_DIR or the working directory are only picked up after
+    clear_profile_caches().
     """
     candidates = []
 
     # 1. Environment variable
     env_dir = os.getenv("KILOMOCO_PROFILES_DIR")
-    if env_dir and Path(env_dir).exists():
+    if env_dir and os.path.isdir(env_dir):
         candidates.append(env_dir)
 
     # 2. ./profiles
-    cwd_profiles = Path.cwd() / "profiles"
-    if cwd_profiles.exists():
-        candidates.append(str(cwd_profiles))
+    cwd_profiles = os.path.join(Path.cwd(), "profiles")
+    if os.path.isdir(cwd_profiles):
+        candidates.append(cwd_profiles)
 
     # 3. ~/.kilomoco/profiles
-    user_profiles = Path.home() / ".kilomoco" / "profiles"
-    if user_profiles.exists():
-        candidates.append(str(user_profiles))
+    user_profiles = os.path.join(Path.home(), ".kilomoco", "profiles")
+    if os.path.isdir(user_profiles):
+        candidates.append(user_profiles)
 
     return candidates
 
 
+def _load_yaml(data: bytes):
+    """Parse YAML data, importing PyYAML on first use.
+
+    Prefers the libyaml-backed CSafeLoader when PyYAML was built with it.
+    """
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(data, Loader=loader)
+
+
+def _load_profile_file(yaml_file: Path) -> Optional[ModeCombinationProfile]:
+    """Load a single YAML profile file, warning and returning None if it is invalid."""
+    try:
+        data = _load_yaml(yaml_file.read_bytes())
+        modes = data.get("modes") if isinstance(data, dict) else None
+        if not isinstance(modes, dict):
+            warnings.warn(f"Skipping invalid profile file {yaml_file}: missing or invalid 'modes' key")
+            return None
+
+        profile_id = data.get("id", yaml_file.stem)
+        return ModeCombinationProfile(
+            id=profile_id,
+            name=data.get("name", profile_id),
+            description=data.get("description", ""),
+            modes=_intern_modes(modes)
+        )
+    except Exception as e:
+        warnings.warn(f"Error loading profile from {yaml_file}: {e}")
+        return None
+
+
 def load_profiles_from_dir(path: str) -> Dict[str, ModeCombinationProfile]:
     """Load profiles from YAML files in the specified directory.
 
@@ -194,46 +259,18 @@ def load_profiles_from_dir(path: str) -> Dict[str, ModeCombinationProfile]:
     Returns a dict keyed by profile.id.
     """
     profiles = {}
-    dir_path = Path(path)
-
-    for yaml_file in dir_path.glob("*.yml"):
-        try:
-            data = yaml.safe_load(yaml_file.read_text(encoding="utf-8"))
-            if not isinstance(data, dict) or "modes" not in data or not isinstance(data["modes"], dict):
-                warnings.warn(f"Skipping invalid profile file {yaml_file}: missing or invalid 'modes' key")
-                continue
-
-            profile_id = data.get("id", yaml_file.stem)
-            profile = ModeCombinationProfile(
-                id=profile_id,
-                name=data.get("name", profile_id),
-                description=data.get("description", ""),
-                modes=data["modes"]
-            )
-            profiles[profile.id] = profile
-        except Exception as e:
-            warnings.warn(f"Error loading profile from {yaml_file}: {e}")
-            continue
-
-    # Also check .yaml files
-    for yaml_file in dir_path.glob("*.yaml"):
-        try:
-            data = yaml.safe_load(yaml_file.read_text(encoding="utf-8"))
-            if not isinstance(data, dict) or "modes" not in data or not isinstance(data["modes"], dict):
-                warnings.warn(f"Skipping invalid profile file {yaml_file}: missing or invalid 'modes' key")
-                continue
-
-            profile_id = data.get("id", yaml_file.stem)
-            profile = ModeCombinationProfile(
-                id=profile_id,
-                name=data.get("name", profile_id),
-                description=data.get("description", ""),
-                modes=data["modes"]
-            )
+
+    # Single directory pass for both suffixes; sorted so load order is deterministic
+    with os.scandir(path) as entries:
+        yaml_files = sorted(
+            Path(entry.path) for entry in entries
+            if entry.name.endswith((".yml", ".yaml")) and entry.is_file()
+        )
+
+    for yaml_file in yaml_files:
+        profile = _load_profile_file(yaml_file)
+        if profile is not None:
             profiles[profile.id] = profile
-        except Exception as e:
-            warnings.warn(f"Error loading profile from {yaml_file}: {e}")
-            continue
 
     return profiles
 
@@ -243,10 +280,16 @@ def discover_profiles() -> Dict[str, ModeCombinationProfile]:
 
     Iterates over profiles_dir_candidates() and loads profiles from each directory.
     Later directories override earlier ones if they have the same profile ID.
-    If no YAML profiles are found, returns an empty dict.
+    The result is ordered by profile ID. If no YAML profiles are found, returns an empty dict.
     """
     all_profiles = {}
     for dir_path in profiles_dir_candidates():
         dir_profiles = load_profiles_from_dir(dir_path)
         all_profiles.update(dir_profiles)
-    return all_profiles
\ No newline at end of file
+    return dict(sorted(all_profiles.items()))
+
+
+def clear_profile_caches() -> None:
+    """Drop cached discovery results so the next lookup rereads the profile directories."""
+    profiles_dir_candidates.cache_clear()
+    default_profiles.cache_clear()
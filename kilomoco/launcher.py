@@ -1,16 +1,39 @@
 """Launcher helpers for starting VS Code with modified configuration."""
-import shutil
-import subprocess
-import sys
-from pathlib import Path
+import os
 from typing import Optional
 
-from .config import default_profiles, ModeCombinationProfile
-from .vscode import apply_mode_configuration, launch_vscode_with_profile
+from .config import clear_profile_caches, default_profiles, ModeCombinationProfile
+from .vscode import (
+    apply_mode_configuration,
+    find_code_cli,
+    launch_vscode_with_profile,
+    spawn_vscode_with_profile,
+)
 
 def check_vscode_available() -> bool:
     """Check if VS Code CLI is available in PATH."""
-    return shutil.which("code") is not None
+    return find_code_cli() is not None
+
+def _resolve_profile(profile_name: str) -> ModeCombinationProfile:
+    """Check VS Code availability and look up the named profile.
+
+    Raises:
+        ValueError: If profile_name is not found in default profiles
+        RuntimeError: If VS Code CLI is not available
+    """
+    # Check VS Code availability
+    if not check_vscode_available():
+        raise RuntimeError("VS Code CLI ('code') not found in PATH. Please ensure VS Code is installed and 'code' command is available.")
+
+    # Get profile (KILOMOCO_FORCE_RELOAD bypasses the cached discovery result)
+    if os.getenv("KILOMOCO_FORCE_RELOAD"):
+        clear_profile_caches()
+    profiles = default_profiles()
+    if profile_name not in profiles:
+        available = ", ".join(profiles.keys())
+        raise ValueError(f"Profile '{profile_name}' not found. Available profiles: {available}")
+
+    return profiles[profile_name]
 
 def prepare_and_launch(profile_name: str, workspace: Optional[str] = None) -> int:
     """Apply the specified profile configuration and launch VS Code.
@@ -26,28 +49,27 @@ def prepare_and_launch(profile_name: str, workspace: Optional[str] = None) -> in
         ValueError: If profile_name is not found in default profiles
         RuntimeError: If VS Code CLI is not available
     """
-    # Check VS Code availability
-    if not check_vscode_available():
-        raise RuntimeError("VS Code CLI ('code') not found in PATH. Please ensure VS Code is installed and 'code' command is available.")
+    profile = _resolve_profile(profile_name)
 
-    # Get profile
-    profiles = default_profiles()
-    if profile_name not in profiles:
-        available = ", ".join(sorted(profiles.keys()))
-        raise ValueError(f"Profile '{profile_name}' not found. Available profiles: {available}")
+    # Apply configuration (the per-profile user data dir persists across launches)
+    user_data_dir = apply_mode_configuration(profile)
+
+    # Launch VS Code
+    return launch_vscode_with_profile(user_data_dir, workspace=workspace)
+
+def prepare_and_launch_detached(profile_name: str, workspace: Optional[str] = None) -> int:
+    """Apply the specified profile configuration and start VS Code without waiting.
+
+    Used by the TUI so no worker stays tied to a VS Code process that may run
+    for hours. Arguments and exceptions match prepare_and_launch.
+
+    Returns:
+        PID of the started VS Code process
+    """
+    profile = _resolve_profile(profile_name)
+
+    # Apply configuration (the per-profile user data dir persists across launches)
+    user_data_dir = apply_mode_configuration(profile)
 
-    profile = profiles[profile_name]
-
-    # Apply configuration
-    temp_dir = apply_mode_configuration(profile)
-
-    try:
-        # Launch VS Code
-        return launch_vscode_with_profile(temp_dir, workspace=workspace)
-    except Exception:
-        # Cleanup temp directory on error
-        try:
-            shutil.rmtree(temp_dir)
-        except Exception:
-            pass  # Ignore cleanup errors
-        raise
\ No newline at end of file
+    # Launch VS Code
+    return spawn_vscode_with_profile(user_data_dir, workspace=workspace)
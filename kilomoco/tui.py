@@ -1,6 +1,7 @@
 """Textual-based TUI for profile selection and VS Code instance management."""
 
-import asyncio
+import functools
+import os
 import shutil
 from pathlib import Path
 from typing import Dict, Any, Optional
@@ -11,8 +12,22 @@ from textual.widgets import Header, Footer, ListView, ListItem, Label, Static, B
 from textual.screen import Screen
 
 from .config import default_profiles, ModeCombinationProfile
-from .vscode import detect_vscode_instances, get_current_profile_from_instance
-from .launcher import prepare_and_launch, check_vscode_available
+from .vscode import detect_vscode_instances, get_current_profile_from_instance, has_kilo_extension
+from .launcher import prepare_and_launch_detached, check_vscode_available
+
+
+# Extension directories (relative to the home directory) probed for the kilo extension
+_COMMON_EXT_DIRS = (
+    os.path.join(".vscode", "extensions"),
+    os.path.join(".vscode-server", "extensions"),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _kilo_extension_installed() -> bool:
+    """Return whether the kilo extension is in a common location (cached per process)."""
+    home = Path.home()
+    return any(has_kilo_extension(os.path.join(home, ext_dir)) for ext_dir in _COMMON_EXT_DIRS)
 
 
 class ProfileListItem(ListItem):
@@ -21,6 +36,7 @@ class ProfileListItem(ListItem):
     def __init__(self, label: Label, profile_id: str = "", profile_name: str = "", **kwargs):
         super().__init__(label, **kwargs)
         self.label = label
+        self.profile_id = profile_id
         self._label_text = f"{profile_id}: {profile_name}" if profile_id and profile_name else str(label)
 
     def __str__(self):
@@ -40,24 +56,29 @@ class ProfileList(ListView):
             yield ProfileListItem(label, profile_id=profile_id, profile_name=profile.name, id=f"profile-{profile_id}")
 
 
+def _render_profile(profile: ModeCombinationProfile) -> str:
+    """Build the details markup for a profile in a single join."""
+    parts = ["[bold]", profile.name, "[/bold]\n\n", profile.description, "\n\n[bold]Modes:[/bold]\n"]
+    parts.append("\n".join(f"  {mode}: {model}" for mode, model in profile.modes.items()))
+    return "".join(parts)
+
+
 class ProfileDetails(Static):
     """Display details of selected profile."""
 
-    def __init__(self, **kwargs):
+    def __init__(self, rendered: Optional[Dict[str, str]] = None, **kwargs):
         super().__init__(**kwargs)
         self.current_profile: Optional[ModeCombinationProfile] = None
+        # profile_id -> pre-rendered markup; profiles missing here are rendered on first use
+        self._rendered: Dict[str, str] = rendered if rendered is not None else {}
 
     def update_profile(self, profile: Optional[ModeCombinationProfile]) -> None:
         """Update the displayed profile details."""
         self.current_profile = profile
         if profile:
-            modes_text = "\n".join(f"  {mode}: {model}" for mode, model in profile.modes.items())
-            content = f"""[bold]{profile.name}[/bold]
-
-{profile.description}
-
-[bold]Modes:[/bold]
-{modes_text}"""
+            content = self._rendered.get(profile.id)
+            if content is None:
+                content = self._rendered[profile.id] = _render_profile(profile)
         else:
             content = "Select a profile to view details."
         self.update(content)
@@ -98,7 +119,9 @@ class MainScreen(Screen):
         self.instances = []
         self.instance_info = InstanceInfo(id="instance-info")
         self.profile_list = ProfileList(self.profiles, id="profile-list")
-        self.profile_details = ProfileDetails(id="profile-details")
+        # Render all details up front so selection is a dict lookup
+        self._rendered_details = {profile_id: _render_profile(profile) for profile_id, profile in self.profiles.items()}
+        self.profile_details = ProfileDetails(rendered=self._rendered_details, id="profile-details")
 
     def compose(self) -> ComposeResult:
         # Header with instance info
@@ -135,28 +158,25 @@ class MainScreen(Screen):
     @on(ListView.Selected)
     def on_profile_selected(self, event: ListView.Selected) -> None:
         """Handle profile selection."""
-        if event.item.id and event.item.id.startswith("profile-"):
-            profile_id = event.item.id[8:]  # Remove "profile-" prefix
-            profile = self.profiles.get(profile_id)
-            if profile:
-                self.profile_details.update_profile(profile)
+        profile = self.profiles.get(getattr(event.item, "profile_id", None))
+        if profile:
+            self.profile_details.update_profile(profile)
 
     async def key_enter(self) -> None:
         """Handle Enter key to launch selected profile."""
-        selected_item = self.profile_list.highlighted_child
-        if selected_item and selected_item.id and selected_item.id.startswith("profile-"):
-            profile_id = selected_item.id[8:]  # Remove "profile-" prefix
+        profile_id = getattr(self.profile_list.highlighted_child, "profile_id", None)
+        if profile_id:
             await self.launch_profile(profile_id)
 
     async def launch_profile(self, profile_id: str) -> int:
-        """Launch VS Code with the selected profile."""
+        """Launch VS Code with the selected profile and return its PID without waiting for it."""
         try:
-            exit_code = await asyncio.to_thread(prepare_and_launch, profile_id)
+            pid = prepare_and_launch_detached(profile_id)
             try:
-                self.notify(f"Successfully launched VS Code with profile '{profile_id}'", severity="information")
+                self.notify(f"Successfully launched VS Code with profile '{profile_id}' (pid {pid})", severity="information")
             except Exception:
                 pass  # Ignore notification errors in test environment
-            return exit_code
+            return pid
         except Exception as e:
             try:
                 self.notify(f"Failed to launch profile '{profile_id}': {e}", severity="error")
@@ -168,65 +188,7 @@ class MainScreen(Screen):
 class KiloMocoTUI(App):
     """Main TUI application."""
 
-    CSS = """
-    Screen {
-        layout: vertical;
-    }
-
-    Header {
-        height: 3;
-        background: $primary;
-        color: $text;
-    }
-
-    Footer {
-        height: 3;
-        background: $primary;
-        color: $text;
-    }
-
-    #instance-info {
-        height: 4;
-        background: $secondary;
-        color: $text;
-        padding: 1;
-        margin-bottom: 1;
-    }
-
-    Horizontal {
-        height: 100%;
-    }
-
-    Vertical {
-        width: 50%;
-        height: 100%;
-        padding: 1;
-    }
-
-    #profile-list {
-        height: 100%;
-        border: solid $primary;
-    }
-
-    #profile-details {
-        height: 100%;
-        border: solid $primary;
-        padding: 1;
-    }
-
-    ListItem {
-        padding: 0 1;
-    }
-
-    ListItem:hover {
-        background: $accent;
-    }
-
-    ListItem:selected {
-        background: $primary;
-        color: $text;
-    }
-    """
+    CSS_PATH = "tui.tcss"
 
     def on_mount(self) -> None:
         """Check prerequisites on startup."""
@@ -235,15 +197,7 @@ class KiloMocoTUI(App):
             return
 
         # Check if kilo extension is available (look in common locations)
-        kilo_found = False
-        common_ext_dirs = [
-            Path.home() / ".vscode" / "extensions",
-            Path.home() / ".vscode-server" / "extensions",
-        ]
-        for ext_dir in common_ext_dirs:
-            if (ext_dir / "kilocode.kilo-code").exists():
-                kilo_found = True
-                break
+        kilo_found = _kilo_extension_installed()
 
         if not kilo_found:
             self.notify(
@@ -1,19 +1,97 @@
 """VS Code integration helpers.
 
-Implements the temporary user data directory strategy for applying kilo extension mode configurations.
+Implements the user data directory strategies for applying kilo extension mode configurations:
+a persistent per-profile directory (default) or a fresh temporary one.
 """
+import functools
 import tempfile
 import os
 import json
 import subprocess
+import sys
+import threading
+import warnings
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, FrozenSet, Iterator, List, Mapping, Sequence, Set, Tuple, Union
 import shutil
-import psutil
 
-def create_temporary_user_data_dir(prefix: str = "kilomoco-profile-") -> str:
-    """Create and return a temporary directory path for VS Code user-data-dir."""
-    return tempfile.mkdtemp(prefix=prefix)
+try:
+    import orjson  # Optional C encoder/decoder; the stdlib json module is the fallback
+except ImportError:
+    orjson = None
+
+from .config import default_profiles
+
+@functools.lru_cache(maxsize=1)
+def find_code_cli() -> Optional[str]:
+    """Return the absolute path of the VS Code CLI ('code'), or None if not in PATH.
+
+    The PATH lookup is cached for the lifetime of the process.
+    """
+    return shutil.which("code")
+
+def create_temporary_user_data_dir(prefix: str = "kilomoco-profile-", dir: Optional[str] = None) -> str:
+    """Create and return a temporary directory path for VS Code user-data-dir.
+
+    The directory is created under dir, or the platform temp dir
+    (tempfile.gettempdir(), which honors TMPDIR) when dir is None.
+    """
+    return tempfile.mkdtemp(prefix=prefix, dir=dir)
+
+def _profile_user_data_path(profile_id: str) -> str:
+    """Return the persistent user-data-dir path for a profile without touching the filesystem."""
+    if profile_id in ("", ".", "..") or os.sep in profile_id or (os.altsep and os.altsep in profile_id):
+        raise ValueError(f"Invalid profile id for a user data dir: {profile_id!r}")
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return os.path.join(cache_home, "kilomoco", "profiles", profile_id)
+
+def profile_user_data_dir(profile_id: str) -> str:
+    """Return the persistent VS Code user-data-dir for a profile, creating it if needed.
+
+    Directories live under $XDG_CACHE_HOME/kilomoco/profiles/<profile_id>
+    (~/.cache when XDG_CACHE_HOME is unset) and are reused across launches,
+    so VS Code keeps its caches and no directories are leaked.
+    """
+    user_data_dir = _profile_user_data_path(profile_id)
+    os.makedirs(user_data_dir, exist_ok=True)
+    return user_data_dir
+
+# 'User' directories of persistent profile dirs already created by this process
+_prepared_user_dirs: Set[str] = set()
+
+# Persistent settings.json files written by this process: path -> (mode settings, st_mtime_ns, st_size)
+_written_settings: Dict[str, Tuple[Dict[str, Any], int, int]] = {}
+
+def _is_mode_model_key(key: str) -> bool:
+    """Return True for the kilo-code.<mode>.model keys managed by kilomoco."""
+    return key.startswith('kilo-code.') and key.endswith('.model')
+
+@functools.lru_cache(maxsize=64)
+def _mode_settings(modes: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    """Build the settings dict for a frozen mode -> model mapping (cached, do not mutate)."""
+    return {f"kilo-code.{mode_name}.model": model_name for mode_name, model_name in modes}
+
+@functools.lru_cache(maxsize=64)
+def _encoded_mode_settings(modes: Tuple[Tuple[str, str], ...]) -> bytes:
+    """Return the UTF-8 settings.json payload for a frozen mode -> model mapping (cached)."""
+    return _encode_json(_mode_settings(modes))
+
+def _profile_mode_settings(profile) -> Dict[str, Any]:
+    """Return the settings dict for profile, cached when its models are hashable (do not mutate)."""
+    modes = tuple(profile.modes.items())
+    try:
+        return _mode_settings(modes)
+    except TypeError:
+        # Models given as mappings or lists (allowed in YAML profiles) cannot key the cache
+        return _mode_settings.__wrapped__(modes)
+
+def _profile_settings_payload(profile) -> bytes:
+    """Return the encoded settings.json payload for profile, cached when its models are hashable."""
+    modes = tuple(profile.modes.items())
+    try:
+        return _encoded_mode_settings(modes)
+    except TypeError:
+        return _encode_json(_mode_settings.__wrapped__(modes))
 
 def generate_mode_settings(profile) -> Dict[str, Any]:
     """Generate VS Code settings dict for the given mode combination profile.
@@ -21,55 +99,274 @@ def generate_mode_settings(profile) -> Dict[str, Any]:
     Based on architect research, kilo extension uses 'kilo-code.*' settings keys.
     Sets model for each mode in the profile combination.
     """
-    settings = {}
-    for mode_name, model_name in profile.modes.items():
-        settings[f"kilo-code.{mode_name}.model"] = model_name
-    return settings
+    return dict(_profile_mode_settings(profile))
 
-def apply_mode_configuration(profile, *, strategy: str = "temp_user_data_dir", workspace: Optional[str] = None) -> str:
+def apply_mode_configuration(profile, *, strategy: str = "profile_user_data_dir", workspace: Optional[str] = None) -> str:
     """Apply the profile configuration using the specified strategy.
 
-    Currently only supports 'temp_user_data_dir' strategy.
-    Returns the path to the applied configuration (temp user data dir).
+    Supported strategies:
+    - 'profile_user_data_dir': reuse a persistent per-profile user data dir (default);
+      only the kilo-code.<mode>.model keys of its settings.json are updated
+    - 'temp_user_data_dir': create a fresh temporary user data dir
+
+    Returns the path to the applied configuration (user data dir).
     """
-    if strategy != "temp_user_data_dir":
-        raise ValueError(f"Unsupported strategy: {strategy}. Only 'temp_user_data_dir' is implemented.")
+    if strategy == "profile_user_data_dir":
+        user_data_dir = _profile_user_data_path(profile.id)
+        user_dir = os.path.join(user_data_dir, "User")
+        # Relaunches only need a stat; makedirs runs once per dir and process
+        if user_dir not in _prepared_user_dirs or not os.path.isdir(user_dir):
+            os.makedirs(user_dir, mode=0o700, exist_ok=True)
+            _prepared_user_dirs.add(user_dir)
+    elif strategy == "temp_user_data_dir":
+        user_data_dir = create_temporary_user_data_dir()
+        user_dir = os.path.join(user_data_dir, "User")
+        # mkdtemp just created the empty, private (0o700) parent; one mkdir suffices
+        os.mkdir(user_dir, 0o700)
+    else:
+        raise ValueError(f"Unsupported strategy: {strategy}. Use 'profile_user_data_dir' or 'temp_user_data_dir'.")
 
-    # Create temporary user data directory
-    temp_dir = create_temporary_user_data_dir()
-    user_dir = Path(temp_dir) / "User"
-    user_dir.mkdir(parents=True, exist_ok=True)
+    # Write settings.json atomically
+    settings_path = os.path.join(user_dir, "settings.json")
+    if strategy == "profile_user_data_dir":
+        # Merge into the settings the user saved in this profile's VS Code
+        _write_settings_if_changed(settings_path, _profile_mode_settings(profile))
+    else:
+        # A fresh temp user data dir has no settings yet and is discarded with
+        # the VS Code session: write the cached payload and skip the fsyncs
+        _write_bytes_atomically(settings_path, _profile_settings_payload(profile), fsync=False)
 
-    # Generate settings
-    settings = generate_mode_settings(profile)
+    return user_data_dir
 
-    # Write settings.json atomically
-    settings_path = user_dir / "settings.json"
-    _write_json_atomically(settings_path, settings)
+def _write_settings_if_changed(settings_path: str, mode_settings: Dict[str, Any]) -> None:
+    """Merge mode_settings into settings_path, leaving all other user settings in place.
+
+    Only the kilo-code.<mode>.model keys are replaced; those of modes the
+    profile no longer has are dropped. A file that cannot be parsed is kept
+    unchanged with a warning. Nothing is read or written when this process
+    already applied the same settings and the file's mtime and size are
+    unchanged since, so edits made by VS Code in the meantime are merged again.
+    """
+    written = _written_settings.get(settings_path)
+    if written is not None and written[0] == mode_settings:
+        try:
+            st = os.stat(settings_path)
+        except OSError:
+            pass
+        else:
+            if (st.st_mtime_ns, st.st_size) == written[1:]:
+                return
+
+    try:
+        with open(settings_path, 'rb') as f:
+            raw: Optional[bytes] = f.read()
+    except FileNotFoundError:
+        raw = None
+    current: Any = {}
+    if raw is not None and raw.strip():
+        try:
+            current = _decode_json(raw)
+        except ValueError:
+            current = None
+        if not isinstance(current, dict):
+            warnings.warn(f"Could not parse {settings_path} as a JSON object; "
+                          "leaving it unchanged without applying the profile's models")
+            return
+
+    merged = {key: value for key, value in current.items() if not _is_mode_model_key(key)}
+    merged.update(mode_settings)
+    if raw is None or merged != current:
+        _write_bytes_atomically(settings_path, _encode_json(merged))
+    st = os.stat(settings_path)
+    _written_settings[settings_path] = (mode_settings, st.st_mtime_ns, st.st_size)
+
+def _encode_json(data: Dict[str, Any]) -> bytes:
+    """Encode data as the indented UTF-8 JSON written to settings.json.
 
-    return temp_dir
+    Both backends emit the same bytes, except that floats may be formatted
+    differently (e.g. orjson writes 1e-7 where json writes 1e-07); the decoded
+    values are identical.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _decode_json(data: bytes) -> Any:
+    """Decode UTF-8 JSON bytes; raises ValueError (incl. JSONDecodeError) on bad input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-def _write_json_atomically(path: Path, data: Dict[str, Any]) -> None:
+def _write_json_atomically(path: Path, data: Dict[str, Any], fsync: bool = True) -> None:
     """Write JSON data to file atomically using a temporary file."""
-    temp_path = path.with_suffix('.tmp')
+    # Encode once and issue a single write rather than one write per JSON token
+    _write_bytes_atomically(path, _encode_json(data), fsync=fsync)
+
+def _write_bytes_atomically(path: Union[str, Path], payload: bytes, fsync: bool = True) -> None:
+    """Write an already encoded payload to file atomically using a temporary file.
+
+    The temporary file is unique to this call (mkstemp: O_EXCL, mode 0o600) and
+    lives next to path, so concurrent writers never touch each other's file.
+    The replaced file therefore also ends up with mode 0o600 rather than the
+    umask default. With fsync=False the rename stays atomic but the data is not
+    forced to disk, which suits throwaway files.
+    """
+    # Plain string paths: no Path objects are built on the write path
+    path = os.fspath(path)
+    directory = os.path.dirname(path) or os.curdir
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
     try:
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        temp_path.replace(path)  # Atomic move
+        # Raw fd writes: no buffered file object for a single small payload
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                # Make the contents durable before the rename publishes them
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp_path, path)  # Atomic move
     except Exception:
-        if temp_path.exists():
-            temp_path.unlink()
+        os.unlink(temp_path)
         raise
+    if fsync:
+        _fsync_directory(directory)
 
-def launch_vscode_with_profile(user_data_dir: str, workspace: Optional[str] = None, extensions_dir: Optional[str] = None) -> int:
-    """Launch VS Code using the provided user-data-dir and optional workspace path."""
-    cmd = ["code", "--user-data-dir", user_data_dir]
+def _fsync_directory(directory: Union[str, Path]) -> None:
+    """Persist a rename by fsyncing its directory (no-op where unsupported)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def _build_launch_command(user_data_dir: str, workspace: Optional[str] = None, extensions_dir: Optional[str] = None) -> List[str]:
+    """Build the 'code' command line for the given user-data-dir and options."""
+    cmd = [find_code_cli() or "code", "--user-data-dir", user_data_dir]
     if extensions_dir:
         cmd += ["--extensions-dir", extensions_dir]
     if workspace:
         cmd.append(workspace)
-    return subprocess.call(cmd)
+    return cmd
 
+def launch_vscode_with_profile(user_data_dir: str, workspace: Optional[str] = None, extensions_dir: Optional[str] = None) -> int:
+    """Launch VS Code using the provided user-data-dir and optional workspace path."""
+    # With an absolute executable and close_fds=False (Python's own fds are
+    # non-inheritable anyway), subprocess uses posix_spawn instead of fork+exec
+    return subprocess.Popen(_build_launch_command(user_data_dir, workspace, extensions_dir), close_fds=False).wait()
+
+def spawn_vscode_with_profile(user_data_dir: str, workspace: Optional[str] = None, extensions_dir: Optional[str] = None) -> int:
+    """Start VS Code like launch_vscode_with_profile but return its pid without waiting.
+
+    A daemon thread waits on the child so it is reaped once it exits.
+    """
+    proc = subprocess.Popen(_build_launch_command(user_data_dir, workspace, extensions_dir), close_fds=False)
+    threading.Thread(target=proc.wait, name=f"kilomoco-reap-{proc.pid}", daemon=True).start()
+    return proc.pid
+
+
+# VS Code flags that consume the following argument, mapped to the parsed field they set
+_VALUE_FLAGS = {
+    '--user-data-dir': 'user_data_dir',
+    '--extensions-dir': 'extensions_dir',
+}
+
+def _parse_code_cmdline(cmdline: Sequence[str]) -> Dict[str, Optional[str]]:
+    """Parse a VS Code command line in a single pass.
+
+    Skips the executable, records the values of the flags in _VALUE_FLAGS
+    (given as '--flag value' or '--flag=value') and takes the first positional
+    argument as the workspace.
+
+    Electron helper processes (argv with a '--type=...' switch, e.g. renderer
+    or gpu-process) belong to a window rather than being one; every field is
+    None for them.
+    """
+    parsed: Dict[str, Optional[str]] = dict.fromkeys(('user_data_dir', 'extensions_dir', 'workspace'))
+    args = iter(cmdline)
+    next(args, None)  # executable
+    for arg in args:
+        field = _VALUE_FLAGS.get(arg)
+        if field is not None:
+            parsed[field] = next(args, None)
+        elif arg.startswith('--type='):
+            return dict.fromkeys(parsed)
+        elif arg.startswith('-'):
+            flag, sep, value = arg.partition('=')
+            if sep and flag in _VALUE_FLAGS:
+                parsed[_VALUE_FLAGS[flag]] = value
+        elif parsed['workspace'] is None:
+            parsed['workspace'] = arg
+    return parsed
+
+# Extension id; installed folders are named '<id>' or '<id>-<version>'
+_KILO_EXTENSION_ID = 'kilocode.kilo-code'
+
+def has_kilo_extension(extensions_dir: str) -> bool:
+    """Return True if extensions_dir contains a kilo extension directory.
+
+    A single os.scandir lists the directory; names and entry types come from
+    that listing, so versioned folders are matched without a stat per candidate.
+    """
+    try:
+        with os.scandir(extensions_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if (name == _KILO_EXTENSION_ID or name.startswith(_KILO_EXTENSION_ID + '-')) \
+                        and entry.is_dir(follow_symlinks=False):
+                    return True
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        pass
+    return False
+
+# Process names of the VS Code executable
+_CODE_PROCESS_NAMES = ('code', 'Code')
+
+# procfs mount scanned directly on Linux; None selects the portable psutil scan
+_PROC_DIR: Optional[str] = '/proc' if sys.platform.startswith('linux') else None
+
+def _iter_code_processes() -> Iterator[Tuple[int, Sequence[str]]]:
+    """Yield (pid, cmdline) for every running VS Code process.
+
+    Processes are filtered on their name first; cmdline is only read for VS Code.
+    """
+    if _PROC_DIR is not None and os.path.isdir(_PROC_DIR):
+        return _iter_proc_code_processes(_PROC_DIR)
+    return _iter_psutil_code_processes()
+
+def _iter_proc_code_processes(proc_dir: str) -> Iterator[Tuple[int, Sequence[str]]]:
+    """Scan procfs, reading each process's short comm file before its cmdline."""
+    with os.scandir(proc_dir) as entries:
+        pids = [entry.name for entry in entries if entry.name.isdigit()]
+    for pid in pids:
+        try:
+            with open(os.path.join(proc_dir, pid, 'comm'), 'rb') as f:
+                if os.fsdecode(f.read().rstrip(b'\n')) not in _CODE_PROCESS_NAMES:
+                    continue
+            with open(os.path.join(proc_dir, pid, 'cmdline'), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            continue  # Exited meanwhile or not readable
+        # Arguments are NUL-terminated unless the process rewrote its argv (as psutil handles it)
+        sep = b'\0' if raw.endswith(b'\0') else b' '
+        yield int(pid), [os.fsdecode(arg) for arg in raw.rstrip(sep).split(sep)] if raw else []
+
+def _iter_psutil_code_processes() -> Iterator[Tuple[int, Sequence[str]]]:
+    """Portable process scan through psutil."""
+    import psutil  # Deferred: only detection needs it, launching and --list do not
+
+    for proc in psutil.process_iter(attrs=('pid', 'name')):
+        info = proc.info
+        if info.get('name') not in _CODE_PROCESS_NAMES:
+            continue
+        try:
+            cmdline = proc.cmdline() or ()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        yield info['pid'], cmdline
 
 def detect_vscode_instances() -> List[Dict[str, Any]]:
     """Detect running VS Code instances with kilo extension.
@@ -78,42 +375,29 @@ def detect_vscode_instances() -> List[Dict[str, Any]]:
     Only includes instances with kilo extension installed.
     """
     instances = []
-    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-        try:
-            name = proc.info.get('name')
-            if name in ('code', 'Code'):
-                cmdline = proc.info['cmdline'] or []
-                user_data_dir = None
-                workspace = None
-
-                # Parse command line args
-                i = 0
-                while i < len(cmdline):
-                    arg = cmdline[i]
-                    if arg == '--user-data-dir' and i + 1 < len(cmdline):
-                        user_data_dir = cmdline[i + 1]
-                        i += 1
-                    elif not arg.startswith('-') and workspace is None and arg != 'code':
-                        # First non-flag argument that is not 'code' is likely the workspace
-                        workspace = arg
-                    i += 1
-
-                # Check if kilo extension is installed
-                has_kilo = False
-                if user_data_dir:
-                    extensions_dir = Path(user_data_dir) / 'extensions'
-                    kilo_ext_dir = extensions_dir / 'kilocode.kilo-code'
-                    has_kilo = kilo_ext_dir.exists()
-
-                if has_kilo:
-                    instances.append({
-                        'workspace': workspace,
-                        'user_data_dir': user_data_dir,
-                        'has_kilo': has_kilo,
-                        'pid': proc.info['pid']
-                    })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
+    # Windows sharing a user-data-dir share the answer; probe each dir only once
+    kilo_by_user_data_dir: Dict[str, bool] = {}
+    for pid, cmdline in _iter_code_processes():
+        parsed = _parse_code_cmdline(cmdline)
+        user_data_dir = parsed['user_data_dir']
+        workspace = parsed['workspace']
+
+        # Check if kilo extension is installed
+        has_kilo = False
+        if user_data_dir:
+            cached = kilo_by_user_data_dir.get(user_data_dir)
+            if cached is None:
+                extensions_dir = os.path.join(user_data_dir, 'extensions')
+                cached = kilo_by_user_data_dir[user_data_dir] = has_kilo_extension(extensions_dir)
+            has_kilo = cached
+
+        if has_kilo:
+            instances.append({
+                'workspace': workspace,
+                'user_data_dir': user_data_dir,
+                'has_kilo': has_kilo,
+                'pid': pid
+            })
 
     return instances
 
@@ -128,33 +412,54 @@ def get_current_profile_from_instance(instance: Dict[str, Any]) -> Optional[str]
     if not user_data_dir:
         return None
 
-    settings_path = Path(user_data_dir) / 'User' / 'settings.json'
-    if not settings_path.exists():
-        return None
+    settings_path = os.path.join(user_data_dir, 'User', 'settings.json')
 
+    # One read syscall; the decoder handles the UTF-8 bytes itself
     try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-    except (json.JSONDecodeError, OSError):
+        with open(settings_path, 'rb') as f:
+            raw = f.read()
+        # Settings without any kilo-code key cannot match; skip parsing them
+        if b'"kilo-code.' not in raw:
+            return None
+        settings = _decode_json(raw)
+    except (ValueError, OSError):
+        return None
+    if not isinstance(settings, dict):
         return None
 
-    # Extract kilo-code settings
-    kilo_settings = {}
-    for key, value in settings.items():
-        if key.startswith('kilo-code.'):
-            mode = key.split('.', 2)[1]  # kilo-code.{mode}.model
-            if key.endswith('.model'):
-                kilo_settings[mode] = value
+    # Extract kilo-code.{mode}.model settings
+    kilo_settings = {
+        key.split('.', 2)[1]: value
+        for key, value in settings.items()
+        if _is_mode_model_key(key)
+    }
 
     if not kilo_settings:
         return None
 
-    # Import here to avoid circular imports
-    from .config import default_profiles
+    # default_profiles() is cached per process, so this does no discovery I/O per instance
+    try:
+        return _profile_index(default_profiles()).get(frozenset(kilo_settings.items()))
+    except TypeError:
+        return None  # unhashable setting values cannot match a profile
+
 
-    profiles = default_profiles()
-    for profile_id, profile in profiles.items():
-        if profile.modes == kilo_settings:
-            return profile_id
+# (profiles mapping, index) for the most recently indexed profile set
+_profile_index_cache: Optional[Tuple[Mapping[str, Any], Dict[FrozenSet[Tuple[str, Any]], str]]] = None
 
-    return None
\ No newline at end of file
+def _profile_index(profiles: Mapping[str, Any]) -> Dict[FrozenSet[Tuple[str, Any]], str]:
+    """Return a {frozenset(modes.items()): profile_id} index for profiles.
+
+    The index is rebuilt only when a different profiles mapping is passed, which
+    happens after config.clear_profile_caches(). The first profile wins on duplicates.
+    """
+    global _profile_index_cache
+    if _profile_index_cache is None or _profile_index_cache[0] is not profiles:
+        index: Dict[FrozenSet[Tuple[str, Any]], str] = {}
+        for profile_id, profile in profiles.items():
+            try:
+                index.setdefault(frozenset(profile.modes.items()), profile_id)
+            except TypeError:
+                continue  # profiles with unhashable model values are not indexable
+        _profile_index_cache = (profiles, index)
+    return _profile_index_cache[1]
\ No newline at end of file
@@ -0,0 +1,28 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from kilomoco.config import ModeCombinationProfile
+from kilomoco.vscode import apply_mode_configuration
+
+
+@pytest.fixture(scope="module")
+def applied_profile_dir(tmp_path_factory):
+    """Apply a canonical profile once per module with the temp user data dir strategy.
+
+    Returns the user data dir and its parsed settings.json. The temp dir is
+    created under pytest's tmp root rather than the system temp dir.
+    """
+    profile = ModeCombinationProfile(
+        id="test",
+        name="Test Profile",
+        description="Test",
+        modes={"default": "gpt-4", "code": "claude-3"}
+    )
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("tempfile.tempdir", str(tmp_path_factory.mktemp("user-data")))
+        user_data_dir = Path(apply_mode_configuration(profile, strategy="temp_user_data_dir"))
+    with open(user_data_dir / "User" / "settings.json", 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+    return user_data_dir, settings
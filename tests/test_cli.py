@@ -6,4 +6,32 @@ def test_cli_list_profiles(capsys):
     captured = capsys.readouterr()
     assert "lopr" in captured.out
     assert "Low-Price (Economy)" in captured.out
-    assert rc == 0
\ No newline at end of file
+    assert rc == 0
+
+def test_cli_list_does_not_import_heavy_modules(tmp_path):
+    import os
+    import subprocess
+    from pathlib import Path
+
+    repo_root = Path(__file__).resolve().parent.parent
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPATH=str(repo_root))
+    env.pop("KILOMOCO_PROFILES_DIR", None)
+    code = (
+        "import sys, kilomoco.cli as cli; cli.main(['--list']); "
+        "print(sorted(m for m in ('yaml', 'textual', 'psutil') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "[]"
+
+def test_launcher_import_does_not_import_psutil(tmp_path):
+    import os
+    import subprocess
+    from pathlib import Path
+
+    repo_root = Path(__file__).resolve().parent.parent
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPATH=str(repo_root))
+    code = "import sys, kilomoco.launcher; print('psutil' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "False"
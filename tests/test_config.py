@@ -1,5 +1,13 @@
 import pathlib
-from kilomoco.config import default_profiles
+from dataclasses import FrozenInstanceError
+
+import pytest
+from kilomoco.config import (
+    ModeCombinationProfile,
+    default_profiles,
+    load_profiles_from_file,
+    save_profiles_to_file,
+)
 
 def test_default_profiles_contains_required_profiles():
     profiles = default_profiles()
@@ -24,4 +32,28 @@ def test_default_profiles_have_correct_structure():
         assert profile.id == profile_id
         assert len(profile.name) > 0
         assert len(profile.description) > 0
-        assert len(profile.modes) == 7  # All 7 modes should be defined
\ No newline at end of file
+        assert len(profile.modes) == 7  # All 7 modes should be defined
+
+def test_profiles_file_roundtrip(tmp_path):
+    profiles = {
+        "uni": ModeCombinationProfile(
+            id="uni",
+            name="Unicode Profile",
+            description="Modèles für tests",
+            modes={"default": "model-ä", "code": "model-b"},
+        )
+    }
+    path = tmp_path / "profiles.json"
+    save_profiles_to_file(profiles, str(path))
+
+    loaded = load_profiles_from_file(str(path))
+    assert loaded == profiles
+
+def test_load_profiles_from_missing_file(tmp_path):
+    assert load_profiles_from_file(str(tmp_path / "missing.json")) == {}
+
+def test_profiles_are_immutable_and_slotted():
+    profile = default_profiles()["lopr"]
+    assert not hasattr(profile, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        profile.name = "changed"
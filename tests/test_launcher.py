@@ -1,7 +1,15 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from kilomoco.launcher import check_vscode_available, prepare_and_launch
+from kilomoco.launcher import check_vscode_available, prepare_and_launch, prepare_and_launch_detached
 from kilomoco.config import ModeCombinationProfile
+from kilomoco.vscode import find_code_cli
+
+@pytest.fixture(autouse=True)
+def fresh_code_cli_cache():
+    """Ensure each test performs its own PATH lookup."""
+    find_code_cli.cache_clear()
+    yield
+    find_code_cli.cache_clear()
 
 def test_check_vscode_available_true():
     """Test VS Code availability check when code is in PATH."""
@@ -13,6 +21,13 @@ def test_check_vscode_available_false():
     with patch('shutil.which', return_value=None):
         assert check_vscode_available() is False
 
+def test_check_vscode_available_caches_lookup():
+    """Test that the PATH lookup only runs once per process."""
+    with patch('shutil.which', return_value='/usr/bin/code') as mock_which:
+        assert check_vscode_available() is True
+        assert check_vscode_available() is True
+        mock_which.assert_called_once_with("code")
+
 def test_prepare_and_launch_invalid_profile():
     """Test error handling for invalid profile name."""
     with patch('kilomoco.launcher.check_vscode_available', return_value=True):
@@ -56,14 +71,28 @@ def test_prepare_and_launch_with_workspace(mock_check, mock_apply, mock_launch):
 @patch('kilomoco.launcher.launch_vscode_with_profile', side_effect=Exception("Launch failed"))
 @patch('kilomoco.launcher.apply_mode_configuration')
 @patch('kilomoco.launcher.check_vscode_available', return_value=True)
-def test_prepare_and_launch_cleanup_on_error(mock_check, mock_apply, mock_launch, mock_rmtree):
-    """Test that temp directory is cleaned up when launch fails."""
+def test_prepare_and_launch_keeps_user_data_dir_on_error(mock_check, mock_apply, mock_launch, mock_rmtree):
+    """Test that the persistent per-profile dir is not removed when launch fails."""
     mock_apply.return_value = "/tmp/test-dir"
 
     with pytest.raises(Exception, match="Launch failed"):
         prepare_and_launch("lopr")
 
-    mock_rmtree.assert_called_once_with("/tmp/test-dir")
+    mock_rmtree.assert_not_called()
+
+@patch('kilomoco.launcher.check_vscode_available', return_value=True)
+def test_prepare_and_launch_detached_invalid_profile(mock_check):
+    """Test that the detached path reports unknown profiles like the waiting one."""
+    with pytest.raises(ValueError, match="Profile 'invalid' not found"):
+        prepare_and_launch_detached("invalid")
+
+@patch('kilomoco.launcher.spawn_vscode_with_profile', return_value=4321)
+@patch('kilomoco.launcher.apply_mode_configuration', return_value="/tmp/test-dir")
+@patch('kilomoco.launcher.check_vscode_available', return_value=True)
+def test_prepare_and_launch_detached_returns_pid(mock_check, mock_apply, mock_spawn):
+    """Test the detached launch path used by the TUI returns the spawned PID."""
+    assert prepare_and_launch_detached("lopr", workspace="/path/to/workspace") == 4321
+    mock_spawn.assert_called_once_with("/tmp/test-dir", workspace="/path/to/workspace")
 
 def test_cli_profile_argument(capsys):
     """Test CLI --profile argument integration."""
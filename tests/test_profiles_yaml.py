@@ -1,4 +1,5 @@
 """Tests for YAML-based profile loading."""
+import sys
 import tempfile
 import warnings
 from pathlib import Path
@@ -12,9 +13,18 @@ from kilomoco.config import (
     discover_profiles,
     default_profiles,
     profiles_dir_candidates,
+    clear_profile_caches,
 )
 
 
+@pytest.fixture(autouse=True)
+def fresh_profile_caches():
+    """Ensure each test sees uncached profile discovery."""
+    clear_profile_caches()
+    yield
+    clear_profile_caches()
+
+
 def test_load_profiles_from_dir_success():
     """Test loading profiles from a directory with valid YAML files."""
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -42,6 +52,23 @@ modes:
         assert profile.modes["orchestrator"] == "deepseek-v3.2-exp"
 
 
+def test_load_profiles_from_dir_reads_both_suffixes():
+    """Test that .yml and .yaml files are loaded and other files ignored."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (Path(temp_dir) / "one.yml").write_text("modes:\n  default: model-one\n")
+        (Path(temp_dir) / "two.yaml").write_text("modes:\n  default: model-two\n")
+        (Path(temp_dir) / "notes.txt").write_text("modes:\n  default: ignored\n")
+
+        profiles = load_profiles_from_dir(temp_dir)
+
+        assert list(profiles) == ["one", "two"]
+        assert profiles["one"].modes["default"] == "model-one"
+        assert profiles["two"].modes["default"] == "model-two"
+
+        # Model names are interned so identical names share one object
+        assert profiles["one"].modes["default"] is sys.intern("model-one")
+
+
 def test_discover_profiles_env_var_priority():
     """Test that KILOMOCO_PROFILES_DIR takes priority."""
     with tempfile.TemporaryDirectory() as temp_env_dir, \
@@ -66,8 +93,11 @@ modes:
             mock_cwd.return_value = Path(temp_cwd_dir)
             mock_home.return_value = Path("/tmp")  # Non-existent
 
+            (Path(temp_env_dir) / "another.yml").write_text("modes:\n  default: other-model\n")
+
             profiles = discover_profiles()
 
+            assert list(profiles) == ["another", "test_profile"]
             assert "test_profile" in profiles
             assert profiles["test_profile"].id == "test_profile"
 
@@ -117,6 +147,26 @@ def test_default_profiles_fallback_to_builtin_when_no_yaml():
         assert "copr" in profiles
         assert isinstance(profiles["lopr"], ModeCombinationProfile)
 
+        # Builtin profiles are ordered by id
+        assert list(profiles) == sorted(profiles)
+
+        # Builtin profiles are shared and read-only
+        with pytest.raises(TypeError):
+            profiles["new"] = profiles["lopr"]
+
+
+def test_default_profiles_is_cached_until_cleared():
+    """Test that discovery runs once per process until the caches are cleared."""
+    with patch("kilomoco.config.discover_profiles", return_value={}) as mock_discover:
+        first = default_profiles()
+        second = default_profiles()
+        assert first is second
+        assert mock_discover.call_count == 1
+
+        clear_profile_caches()
+        default_profiles()
+        assert mock_discover.call_count == 2
+
 
 def test_profiles_dir_candidates():
     """Test profiles_dir_candidates returns correct order."""
@@ -152,4 +202,15 @@ def test_profiles_dir_candidates():
             # Check order: env first, then home (cwd not included since profiles doesn't exist)
             env_idx = candidates.index(temp_env)
             home_idx = candidates.index(str(temp_home_profiles))
-            assert env_idx < home_idx
\ No newline at end of file
+            assert env_idx < home_idx
+
+def test_profiles_dir_candidates_ignores_non_directories():
+    """Test that a KILOMOCO_PROFILES_DIR pointing at a file is ignored."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        not_a_dir = Path(temp_dir) / "profiles.yaml"
+        not_a_dir.write_text("modes: {}\n")
+
+        with patch.dict("os.environ", {"KILOMOCO_PROFILES_DIR": str(not_a_dir)}), \
+             patch("pathlib.Path.cwd", return_value=Path(temp_dir)), \
+             patch("pathlib.Path.home", return_value=Path(temp_dir)):
+            assert profiles_dir_candidates() == []
@@ -4,11 +4,17 @@ import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 
-from kilomoco.tui import ProfileList, ProfileDetails, InstanceInfo, MainScreen, KiloMocoTUI
+from kilomoco.tui import (
+    ProfileList,
+    ProfileDetails,
+    InstanceInfo,
+    MainScreen,
+    KiloMocoTUI,
+    _kilo_extension_installed,
+    _render_profile,
+)
 from kilomoco.config import ModeCombinationProfile
 
-pytestmark = pytest.mark.asyncio
-
 
 @pytest.fixture
 def sample_profiles():
@@ -45,6 +51,7 @@ class TestProfileList:
         assert "Test Profile 1" in str(items[0])
         assert "test2" in str(items[1])
         assert "Test Profile 2" in str(items[1])
+        assert [item.profile_id for item in items] == ["test1", "test2"]
 
 
 class TestProfileDetails:
@@ -59,6 +66,23 @@ class TestProfileDetails:
 
         # Check that the profile was stored
         assert details.current_profile == profile
+        assert details.content == (
+            "[bold]Test Profile 1[/bold]\n\nFirst test profile\n\n"
+            "[bold]Modes:[/bold]\n  default: model1\n  code: model2"
+        )
+
+    def test_update_profile_reuses_rendered_markup(self, sample_profiles):
+        """Test that reselecting a profile does not re-render its markup."""
+        details = ProfileDetails()
+        profile = sample_profiles["test1"]
+
+        with patch('kilomoco.tui._render_profile', wraps=_render_profile) as mock_render:
+            details.update_profile(profile)
+            details.update_profile(sample_profiles["test2"])
+            details.update_profile(profile)
+
+        assert mock_render.call_count == 2
+        assert details.current_profile == profile
 
     def test_update_profile_with_none(self):
         """Test updating profile details with None."""
@@ -112,17 +136,40 @@ class TestMainScreen:
 
             mock_detect.assert_called_once()
 
-    @patch('kilomoco.tui.prepare_and_launch')
+    def test_profile_details_are_prerendered(self, sample_profiles):
+        """Test that selecting a profile does not render markup on the fly."""
+        with patch('kilomoco.tui.default_profiles', return_value=sample_profiles):
+            screen = MainScreen()
+
+        with patch('kilomoco.tui._render_profile') as mock_render:
+            screen.profile_details.update_profile(sample_profiles["test2"])
+
+        mock_render.assert_not_called()
+        assert screen.profile_details.content == _render_profile(sample_profiles["test2"])
+
+    def test_on_profile_selected_uses_item_profile_id(self, sample_profiles):
+        """Test that selection resolves the profile from the item's profile_id."""
+        with patch('kilomoco.tui.default_profiles', return_value=sample_profiles):
+            screen = MainScreen()
+        item = next(iter(screen.profile_list.compose()))
+
+        screen.on_profile_selected(MagicMock(item=item))
+
+        assert screen.profile_details.current_profile is sample_profiles["test1"]
+
+    @pytest.mark.asyncio
+    @patch('kilomoco.tui.prepare_and_launch_detached')
     async def test_launch_profile_success(self, mock_launch):
-        """Test successful profile launch."""
-        mock_launch.return_value = 0
+        """Test successful profile launch returns the started PID."""
+        mock_launch.return_value = 4321
 
         screen = MainScreen()
-        await screen.launch_profile("test_profile")
+        assert await screen.launch_profile("test_profile") == 4321
 
         mock_launch.assert_called_once_with("test_profile")
 
-    @patch('kilomoco.tui.prepare_and_launch')
+    @pytest.mark.asyncio
+    @patch('kilomoco.tui.prepare_and_launch_detached')
     async def test_launch_profile_error(self, mock_launch):
         """Test profile launch with error."""
         mock_launch.side_effect = ValueError("Profile not found")
@@ -139,17 +186,46 @@ class TestMainScreen:
 class TestKiloMocoTUI:
     """Test main TUI application."""
 
+    @pytest.fixture(autouse=True)
+    def fresh_extension_probe(self):
+        """Ensure each test probes the (patched) home directory."""
+        _kilo_extension_installed.cache_clear()
+        yield
+        _kilo_extension_installed.cache_clear()
+
     @patch('kilomoco.tui.check_vscode_available')
     @patch('kilomoco.tui.Path.home')
-    def test_on_mount_vscode_available(self, mock_home, mock_check_vscode):
+    def test_on_mount_vscode_available(self, mock_home, mock_check_vscode, tmp_path):
         """Test app mounting when VS Code is available."""
         mock_check_vscode.return_value = True
-        mock_home.return_value = Path("/home/user")
+        mock_home.return_value = tmp_path
+        (tmp_path / ".vscode" / "extensions" / "kilocode.kilo-code-4.2.1").mkdir(parents=True)
 
-        # Mock extension directory check
-        with patch('pathlib.Path.exists', return_value=True):
-            app = KiloMocoTUI()
+        app = KiloMocoTUI()
+        with patch.object(app, 'exit') as mock_exit, patch.object(app, 'notify') as mock_notify:
             app.on_mount()  # Should not exit
+            mock_exit.assert_not_called()
+            mock_notify.assert_not_called()
+
+    @patch('kilomoco.tui.check_vscode_available', return_value=True)
+    @patch('kilomoco.tui.Path.home')
+    def test_on_mount_warns_without_kilo_extension(self, mock_home, mock_check_vscode, tmp_path):
+        """Test that a missing kilo extension only produces a warning."""
+        mock_home.return_value = tmp_path
+
+        app = KiloMocoTUI()
+        with patch.object(app, 'notify') as mock_notify:
+            app.on_mount()
+            assert mock_notify.call_args.kwargs["severity"] == "warning"
+
+    @pytest.mark.asyncio
+    @patch('kilomoco.tui.detect_vscode_instances', return_value=[])
+    @patch('kilomoco.tui.check_vscode_available', return_value=True)
+    async def test_app_mounts_with_stylesheet(self, mock_check_vscode, mock_detect):
+        """Test that the app starts headless and its stylesheet file parses."""
+        app = KiloMocoTUI()
+        async with app.run_test():
+            assert app.query_one("#profile-list").styles.border_top[0] == "solid"
 
     @patch('kilomoco.tui.check_vscode_available')
     def test_on_mount_vscode_not_available(self, mock_check_vscode):
@@ -1,22 +1,35 @@
+import os
+import shutil
 import tempfile
 import json
 from pathlib import Path
 import pytest
+from unittest.mock import patch
 from kilomoco.vscode import (
     create_temporary_user_data_dir,
     generate_mode_settings,
     apply_mode_configuration,
+    profile_user_data_dir,
+    launch_vscode_with_profile,
+    spawn_vscode_with_profile,
     _write_json_atomically,
 )
+from kilomoco import vscode
 from kilomoco.config import ModeCombinationProfile
 
 def test_create_temporary_user_data_dir():
     """Test temporary directory creation with custom prefix."""
     temp_dir = create_temporary_user_data_dir("test-prefix-")
-    assert temp_dir.startswith("/tmp/test-prefix-")
-    assert Path(temp_dir).exists()
+    assert Path(temp_dir).parent == Path(tempfile.gettempdir())
+    assert Path(temp_dir).name.startswith("test-prefix-")
     assert Path(temp_dir).is_dir()
 
+def test_create_temporary_user_data_dir_in_given_dir(tmp_path):
+    """Test that callers can pin the temporary directory to a parent dir."""
+    temp_dir = create_temporary_user_data_dir(dir=str(tmp_path))
+    assert Path(temp_dir).parent == tmp_path
+    assert Path(temp_dir).name.startswith("kilomoco-profile-")
+
 def test_generate_mode_settings_basic():
     """Test basic mode settings generation for profile combination."""
     profile = ModeCombinationProfile(
@@ -57,30 +70,147 @@ def test_generate_mode_settings_full_profile():
         assert f"kilo-code.{mode}.model" in settings
         assert settings[f"kilo-code.{mode}.model"] == f"model{['default', 'orchestrator', 'architect', 'code', 'debug', 'ask', 'administrator'].index(mode) + 1}"
 
-def test_apply_mode_configuration_temp_user_data_dir():
+def test_generate_mode_settings_custom_mode():
+    """Test that modes outside the built-in set still get kilo-code keys."""
+    profile = ModeCombinationProfile(id="custom", name="Custom", description="", modes={"review": "model-r", "code": "model-c"})
+    assert generate_mode_settings(profile) == {"kilo-code.review.model": "model-r", "kilo-code.code.model": "model-c"}
+
+@pytest.mark.parametrize("strategy", ["profile_user_data_dir", "temp_user_data_dir"])
+def test_apply_mode_configuration_unhashable_model(strategy, tmp_path, monkeypatch):
+    """Test models given as mappings bypass the settings cache instead of failing."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    model = {"provider": "a", "id": "b"}
+    profile = ModeCombinationProfile(id="nested", name="Nested", description="", modes={"code": model})
+
+    assert generate_mode_settings(profile) == {"kilo-code.code.model": model}
+    user_data_dir = apply_mode_configuration(profile, strategy=strategy)
+    with open(Path(user_data_dir) / "User" / "settings.json", 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"kilo-code.code.model": model}
+
+def test_generate_mode_settings_is_cached_per_modes():
+    """Repeated calls reuse the cached settings but hand out independent copies."""
+    profile = ModeCombinationProfile(id="cached", name="Cached", description="", modes={"code": "gpt-4"})
+    vscode._mode_settings.cache_clear()
+    first = generate_mode_settings(profile)
+    first["kilo-code.code.model"] = "changed"
+    second = generate_mode_settings(profile)
+    assert second == {"kilo-code.code.model": "gpt-4"}
+    assert vscode._mode_settings.cache_info().hits == 1
+    assert vscode._encoded_mode_settings((("code", "gpt-4"),)) is vscode._encoded_mode_settings((("code", "gpt-4"),))
+
+def test_apply_mode_configuration_temp_user_data_dir(applied_profile_dir):
     """Test applying configuration with temp user data dir strategy."""
+    user_data_dir, _ = applied_profile_dir
+
+    # Check directory structure
+    user_dir = user_data_dir / "User"
+    assert user_dir.is_dir()
+    assert (user_dir / "settings.json").is_file()
+    assert user_data_dir.name.startswith("kilomoco-profile-")
+    if os.name == "posix":
+        assert user_data_dir.stat().st_mode & 0o777 == 0o700
+        assert user_dir.stat().st_mode & 0o077 == 0
+
+def test_apply_mode_configuration_temp_user_data_dir_settings(applied_profile_dir):
+    """Test the settings.json written into the temp user data dir."""
+    _, settings = applied_profile_dir
+
+    assert settings == {"kilo-code.default.model": "gpt-4", "kilo-code.code.model": "claude-3"}
+
+def test_apply_mode_configuration_reuses_profile_user_data_dir(tmp_path, monkeypatch):
+    """Test the default strategy writes into a persistent per-profile dir."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
     profile = ModeCombinationProfile(
         id="test",
         name="Test Profile",
         description="Test",
-        modes={"default": "gpt-4", "code": "claude-3"}
+        modes={"default": "gpt-4"}
     )
-    temp_dir = apply_mode_configuration(profile, strategy="temp_user_data_dir")
 
-    # Check directory structure
-    user_dir = Path(temp_dir) / "User"
-    assert user_dir.exists()
-    assert user_dir.is_dir()
+    first = apply_mode_configuration(profile)
+    second = apply_mode_configuration(profile)
 
-    # Check settings.json content
-    settings_file = user_dir / "settings.json"
-    assert settings_file.exists()
+    assert first == second == str(tmp_path / "kilomoco" / "profiles" / "test")
+    with open(Path(first) / "User" / "settings.json", 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"kilo-code.default.model": "gpt-4"}
 
-    with open(settings_file, 'r', encoding='utf-8') as f:
-        settings = json.load(f)
+def test_apply_mode_configuration_recreates_removed_profile_dir(tmp_path, monkeypatch):
+    """Test a prepared profile dir deleted between launches is created again."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    profile = ModeCombinationProfile(id="gone", name="Gone", description="", modes={"code": "gpt-4"})
 
-    assert settings["kilo-code.default.model"] == "gpt-4"
-    assert settings["kilo-code.code.model"] == "claude-3"
+    user_data_dir = apply_mode_configuration(profile)
+    shutil.rmtree(user_data_dir)
+    assert apply_mode_configuration(profile) == user_data_dir
+    assert (Path(user_data_dir) / "User" / "settings.json").exists()
+
+def test_apply_mode_configuration_skips_unchanged_settings(tmp_path, monkeypatch):
+    """Test relaunching a profile leaves an untouched settings.json alone and merges into edits."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    profile = ModeCombinationProfile(id="same", name="Same", description="", modes={"code": "gpt-4"})
+
+    user_data_dir = apply_mode_configuration(profile)
+    settings_path = Path(user_data_dir) / "User" / "settings.json"
+    with patch('kilomoco.vscode._write_bytes_atomically') as mock_write:
+        apply_mode_configuration(profile)
+    mock_write.assert_not_called()
+
+    # VS Code saved the user's settings over the file, dropping the kilo key
+    settings_path.write_text('{"editor.fontSize": 14}', encoding='utf-8')
+    apply_mode_configuration(profile)
+    assert json.loads(settings_path.read_text(encoding='utf-8')) == {
+        "editor.fontSize": 14,
+        "kilo-code.code.model": "gpt-4",
+    }
+
+    # The merged file is recorded, so the next relaunch is a no-op again
+    with patch('kilomoco.vscode._write_bytes_atomically') as mock_write:
+        apply_mode_configuration(profile)
+    mock_write.assert_not_called()
+
+def test_apply_mode_configuration_keeps_user_settings(tmp_path, monkeypatch):
+    """Test settings saved in VS Code survive a relaunch; only the kilo model keys are replaced."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(vscode, "_written_settings", {})
+    old = ModeCombinationProfile(id="keep", name="Keep", description="", modes={"code": "gpt-4", "ask": "gpt-3.5"})
+    new = ModeCombinationProfile(id="keep", name="Keep", description="", modes={"code": "claude-3"})
+
+    user_data_dir = apply_mode_configuration(old)
+    settings_path = Path(user_data_dir) / "User" / "settings.json"
+    settings = json.loads(settings_path.read_text(encoding='utf-8'))
+    settings.update({"editor.fontSize": 14, "kilo-code.autoApprove": True})
+    settings_path.write_text(json.dumps(settings), encoding='utf-8')
+
+    vscode._written_settings.clear()  # A later kilomoco process
+    apply_mode_configuration(new)
+
+    assert json.loads(settings_path.read_text(encoding='utf-8')) == {
+        "editor.fontSize": 14,
+        "kilo-code.autoApprove": True,
+        "kilo-code.code.model": "claude-3",
+    }
+
+def test_apply_mode_configuration_keeps_unparseable_settings(tmp_path, monkeypatch):
+    """Test a settings.json that is not plain JSON is left untouched with a warning."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    profile = ModeCombinationProfile(id="jsonc", name="JSONC", description="", modes={"code": "gpt-4"})
+    settings_path = tmp_path / "kilomoco" / "profiles" / "jsonc" / "User" / "settings.json"
+    settings_path.parent.mkdir(parents=True)
+    content = '{\n  // my font\n  "editor.fontSize": 14,\n}\n'
+    settings_path.write_text(content, encoding='utf-8')
+
+    with pytest.warns(UserWarning, match="Could not parse"):
+        apply_mode_configuration(profile)
+
+    assert settings_path.read_text(encoding='utf-8') == content
+
+@pytest.mark.parametrize("profile_id", ["", "..", "../escape", "a/b"])
+def test_profile_user_data_dir_rejects_path_like_ids(profile_id, tmp_path, monkeypatch):
+    """Test that profile ids cannot escape the cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    with pytest.raises(ValueError, match="Invalid profile id"):
+        profile_user_data_dir(profile_id)
 
 def test_apply_mode_configuration_unsupported_strategy():
     """Test that unsupported strategies raise ValueError."""
@@ -106,6 +236,41 @@ def test_write_json_atomically():
             loaded = json.load(f)
         assert loaded == data
 
+def test_write_json_atomically_writes_utf8():
+    """Test that non-ASCII values are written as UTF-8 text."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.json"
+        data = {"kilo-code.default.model": "modèle-ü"}
+
+        _write_json_atomically(path, data)
+
+        assert "modèle-ü" in path.read_text(encoding='utf-8')
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f) == data
+
+def test_write_json_atomically_fsyncs_before_rename():
+    """Test that the temp file is flushed to disk before it replaces the target."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.json"
+
+        with patch('kilomoco.vscode.os.fsync') as mock_fsync:
+            _write_json_atomically(path, {"key": "value"})
+
+        # File contents, plus the directory entry where O_DIRECTORY is available
+        assert mock_fsync.call_count == (2 if hasattr(os, 'O_DIRECTORY') else 1)
+        assert json.loads(path.read_text(encoding='utf-8')) == {"key": "value"}
+
+def test_apply_temp_user_data_dir_skips_fsync():
+    """Test that throwaway temp user data dirs are written without fsync."""
+    profile = ModeCombinationProfile(id="temp", name="Temp", description="", modes={"code": "gpt-4"})
+
+    with patch('kilomoco.vscode.os.fsync') as mock_fsync:
+        user_data_dir = apply_mode_configuration(profile, strategy="temp_user_data_dir")
+
+    mock_fsync.assert_not_called()
+    with open(Path(user_data_dir) / "User" / "settings.json", 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"kilo-code.code.model": "gpt-4"}
+
 def test_write_json_atomically_atomicity():
     """Test that atomic write doesn't leave partial files on failure."""
     # This is a basic test; in practice, we'd need to simulate filesystem errors
@@ -116,6 +281,96 @@ def test_write_json_atomically_atomicity():
         _write_json_atomically(path, data)
         assert path.exists()
 
-        # Verify no .tmp file remains
-        tmp_file = path.with_suffix('.tmp')
-        assert not tmp_file.exists()
\ No newline at end of file
+        # Verify no temp file remains
+        assert os.listdir(temp_dir) == ["test.json"]
+
+def test_write_json_atomically_removes_temp_file_on_failure():
+    """Test that a failed rename leaves neither the target nor the temp file behind."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.json"
+
+        with patch('kilomoco.vscode.os.replace', side_effect=OSError("rename failed")):
+            with pytest.raises(OSError, match="rename failed"):
+                _write_json_atomically(path, {"key": "value"})
+
+        assert os.listdir(temp_dir) == []
+
+def test_encode_json_stdlib_fallback_matches_orjson():
+    """Test that both JSON backends produce the same settings.json bytes."""
+    data = {
+        "kilo-code.default.model": "modèle-ü",
+        "kilo-code.code.model": "gpt-4",
+        "editor.rulers": [80, 120],
+        "kilo-code.nested": {"enabled": True, "disabled": False, "fallback": None, "ratio": 0.5, "tags": ["a", "ß"]},
+        "kilo-code.temperature": 1.5,
+    }
+    # Exponent floats are formatted differently by the backends (1e-07 vs 1e-7),
+    # so they are only compared by decoded value.
+    exponent_floats = {"kilo-code.epsilon": 1e-7, "kilo-code.limit": 2.5e20}
+    with patch('kilomoco.vscode.orjson', None):
+        fallback = vscode._encode_json(data)
+        assert vscode._decode_json(fallback) == data
+        fallback_floats = vscode._decode_json(vscode._encode_json(exponent_floats))
+    assert fallback == json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    assert fallback_floats == exponent_floats
+
+    orjson = pytest.importorskip("orjson")
+    with patch('kilomoco.vscode.orjson', orjson):
+        assert vscode._encode_json(data) == fallback
+        assert vscode._decode_json(vscode._encode_json(exponent_floats)) == fallback_floats
+        with pytest.raises(ValueError):
+            vscode._decode_json(b"{not json")
+
+def test_write_json_atomically_leaves_other_temp_files_alone():
+    """Test that another writer's temp file neither blocks the write nor gets removed."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.json"
+        other = Path(f"{path}.tmp")
+        other.write_text("partial", encoding='utf-8')
+
+        _write_json_atomically(path, {"key": "value"})
+
+        assert json.loads(path.read_text(encoding='utf-8')) == {"key": "value"}
+        assert other.read_text(encoding='utf-8') == "partial"
+        assert sorted(os.listdir(temp_dir)) == ["test.json", "test.json.tmp"]
+
+def test_write_json_atomically_concurrent_writers():
+    """Test that concurrent writers to one path each publish a complete file."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "settings.json"
+
+        def write(n):
+            for _ in range(20):
+                _write_json_atomically(path, {"writer": n}, fsync=False)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(write, range(4)))
+
+        assert json.loads(path.read_text(encoding='utf-8'))["writer"] in range(4)
+        assert os.listdir(temp_dir) == ["settings.json"]
+
+def test_launch_vscode_uses_resolved_cli_path():
+    """Test that the launcher executes the cached absolute path of 'code'."""
+    with patch('kilomoco.vscode.find_code_cli', return_value='/usr/bin/code'), \
+         patch('kilomoco.vscode.subprocess.Popen') as mock_popen:
+        mock_popen.return_value.wait.return_value = 0
+        rc = launch_vscode_with_profile("/tmp/user-data", workspace="/path/to/workspace")
+
+    assert rc == 0
+    mock_popen.assert_called_once_with(
+        ["/usr/bin/code", "--user-data-dir", "/tmp/user-data", "/path/to/workspace"], close_fds=False)
+
+def test_spawn_vscode_returns_pid_and_reaps_in_background():
+    """Test that the detached launcher returns at once and waits on the child in a thread."""
+    with patch('kilomoco.vscode.find_code_cli', return_value='/usr/bin/code'), \
+         patch('kilomoco.vscode.subprocess.Popen') as mock_popen, \
+         patch('kilomoco.vscode.threading.Thread') as mock_thread:
+        mock_popen.return_value.pid = 4321
+        pid = spawn_vscode_with_profile("/tmp/user-data")
+
+    assert pid == 4321
+    mock_popen.return_value.wait.assert_not_called()
+    mock_thread.assert_called_once_with(target=mock_popen.return_value.wait, name="kilomoco-reap-4321", daemon=True)
+    mock_thread.return_value.start.assert_called_once_with()
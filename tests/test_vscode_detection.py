@@ -2,112 +2,228 @@
 
 import pytest
 import json
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from pathlib import Path
+from types import SimpleNamespace
 import tempfile
 
-from kilomoco.vscode import detect_vscode_instances, get_current_profile_from_instance
+import psutil
+
+from kilomoco import vscode
+from kilomoco.config import ModeCombinationProfile, clear_profile_caches
+from kilomoco.vscode import _parse_code_cmdline, detect_vscode_instances, get_current_profile_from_instance
+
+
+def fake_proc(pid, name, cmdline=(), error=None):
+    """Lightweight stand-in for a process yielded by psutil.process_iter(attrs=...)."""
+    def read_cmdline():
+        if error is not None:
+            raise error
+        return list(cmdline)
+    return SimpleNamespace(info={'pid': pid, 'name': name}, cmdline=read_cmdline)
 
 
 class TestDetectVscodeInstances:
     """Test detect_vscode_instances function."""
 
-    @patch('kilomoco.vscode.psutil.process_iter')
-    def test_detect_instances_with_kilo(self, mock_process_iter):
-        """Test detecting VS Code instances with kilo extension."""
-        # Mock process
-        mock_proc = MagicMock()
-        mock_proc.info = {
-            'pid': 1234,
-            'name': 'code',
-            'cmdline': ['code', '--user-data-dir', '/tmp/user-data', '/path/to/workspace']
-        }
-        mock_process_iter.return_value = [mock_proc]
+    @pytest.fixture(autouse=True)
+    def use_psutil_scan(self, monkeypatch):
+        """Exercise the portable psutil scan regardless of the host platform."""
+        monkeypatch.setattr(vscode, '_PROC_DIR', None)
 
-        with patch('kilomoco.vscode.Path') as mock_path:
-            # Mock Path to return a mock with exists() returning True for kilo extension
-            mock_path_instance = MagicMock()
-            mock_path_instance.__truediv__().__truediv__().exists.return_value = True
-            mock_path.return_value = mock_path_instance
+    @patch('psutil.process_iter')
+    def test_detect_instances_with_kilo(self, mock_process_iter, tmp_path):
+        """Test detecting VS Code instances with kilo extension."""
+        (tmp_path / 'extensions' / 'kilocode.kilo-code').mkdir(parents=True)
+        mock_process_iter.return_value = [
+            fake_proc(1234, 'code', ['code', '--user-data-dir', str(tmp_path), '/path/to/workspace'])
+        ]
 
-            instances = detect_vscode_instances()
+        instances = detect_vscode_instances()
 
-            assert len(instances) == 1
-            assert instances[0]['workspace'] == '/path/to/workspace'
-            assert instances[0]['user_data_dir'] == '/tmp/user-data'
-            assert instances[0]['has_kilo'] is True
-            assert instances[0]['pid'] == 1234
+        assert len(instances) == 1
+        assert instances[0]['workspace'] == '/path/to/workspace'
+        assert instances[0]['user_data_dir'] == str(tmp_path)
+        assert instances[0]['has_kilo'] is True
+        assert instances[0]['pid'] == 1234
 
-    @patch('kilomoco.vscode.psutil.process_iter')
-    def test_detect_instances_without_kilo(self, mock_process_iter):
+    @patch('psutil.process_iter')
+    def test_detect_instances_without_kilo(self, mock_process_iter, tmp_path):
         """Test detecting VS Code instances without kilo extension."""
-        # Mock process
-        mock_proc = MagicMock()
-        mock_proc.info = {
-            'pid': 1234,
-            'name': 'code',
-            'cmdline': ['code', '--user-data-dir', '/tmp/user-data']
-        }
-        mock_process_iter.return_value = [mock_proc]
+        (tmp_path / 'extensions' / 'other.extension').mkdir(parents=True)
+        # A plain file with the extension's name is not an installed extension
+        (tmp_path / 'extensions' / 'kilocode.kilo-code').touch()
+        mock_process_iter.return_value = [fake_proc(1234, 'code', ['code', '--user-data-dir', str(tmp_path)])]
+
+        instances = detect_vscode_instances()
+
+        assert len(instances) == 0  # Should be filtered out
+
+    @patch('psutil.process_iter')
+    def test_detect_instances_missing_extensions_dir(self, mock_process_iter, tmp_path):
+        """Test that a user-data-dir without an extensions dir has no kilo."""
+        mock_process_iter.return_value = [
+            fake_proc(1234, 'code', ['code', '--user-data-dir', str(tmp_path / 'missing')])
+        ]
+
+        assert detect_vscode_instances() == []
+
+    @patch('psutil.process_iter')
+    def test_detect_instances_ignores_electron_helpers(self, mock_process_iter, tmp_path):
+        """Test that renderer/gpu helper processes of a window are not reported as instances."""
+        (tmp_path / 'extensions' / 'kilocode.kilo-code').mkdir(parents=True)
+        user_data_dir = str(tmp_path)
+        mock_process_iter.return_value = [
+            fake_proc(100, 'code', ['/usr/share/code/code', '--user-data-dir', user_data_dir, '/ws']),
+            fake_proc(102, 'code', ['/usr/share/code/code', '--type=gpu-process', f'--user-data-dir={user_data_dir}']),
+            fake_proc(103, 'code', ['/usr/share/code/code', '--type=renderer', f'--user-data-dir={user_data_dir}',
+                                    '--app-path=/usr/share/code/resources/app']),
+        ]
 
-        with patch('kilomoco.vscode.Path') as mock_path:
-            # Mock Path to return a mock with exists() returning False for kilo extension
-            mock_path_instance = MagicMock()
-            mock_path_instance.__truediv__().__truediv__().exists.return_value = False
-            mock_path.return_value = mock_path_instance
+        instances = detect_vscode_instances()
 
+        assert [(i['pid'], i['workspace']) for i in instances] == [(100, '/ws')]
+
+    @patch('psutil.process_iter')
+    def test_detect_instances_probes_shared_user_data_dir_once(self, mock_process_iter):
+        """Test that windows sharing a user-data-dir trigger a single extension probe."""
+        mock_process_iter.return_value = [
+            fake_proc(pid, 'code', ['code', '--user-data-dir', '/tmp/shared-data', workspace])
+            for pid, workspace in ((1, '/ws/one'), (2, '/ws/two'))
+        ]
+
+        with patch('kilomoco.vscode.has_kilo_extension', return_value=True) as mock_probe:
             instances = detect_vscode_instances()
 
-            assert len(instances) == 0  # Should be filtered out
+        assert [instance['pid'] for instance in instances] == [1, 2]
+        mock_probe.assert_called_once_with('/tmp/shared-data/extensions')
 
-    @patch('kilomoco.vscode.psutil.process_iter')
+    @patch('psutil.process_iter')
     def test_detect_instances_no_user_data_dir(self, mock_process_iter):
         """Test detecting VS Code instances without user-data-dir."""
-        # Mock process
-        mock_proc = MagicMock()
-        mock_proc.info = {
-            'pid': 1234,
-            'name': 'code',
-            'cmdline': ['/usr/bin/code', '/path/to/workspace']
-        }
-        mock_process_iter.return_value = [mock_proc]
+        mock_process_iter.return_value = [fake_proc(1234, 'code', ['/usr/bin/code', '/path/to/workspace'])]
 
         instances = detect_vscode_instances()
 
         assert len(instances) == 0  # Should be filtered out due to no user-data-dir
 
-    @patch('kilomoco.vscode.psutil.process_iter')
+    @patch('psutil.process_iter')
     def test_detect_instances_wrong_process_name(self, mock_process_iter):
         """Test that non-VS Code processes are ignored."""
-        # Mock non-VS Code process
-        mock_proc = MagicMock()
-        mock_proc.info = {
-            'pid': 1234,
-            'name': 'chrome',
-            'cmdline': ['/usr/bin/chrome']
-        }
-        mock_process_iter.return_value = [mock_proc]
+        # Non-VS Code process whose cmdline must not be read
+        mock_process_iter.return_value = [
+            fake_proc(1234, 'chrome', error=AssertionError("cmdline read for a non-VS Code process"))
+        ]
 
         instances = detect_vscode_instances()
 
         assert len(instances) == 0
 
-    @patch('kilomoco.vscode.psutil.process_iter')
+    @patch('psutil.process_iter')
     def test_detect_instances_access_denied(self, mock_process_iter):
         """Test handling of access denied exceptions."""
-        # Mock process that raises exception
-        mock_proc = MagicMock()
-        mock_proc.info = {}  # This will cause an exception in the loop
-        mock_process_iter.return_value = [mock_proc]
+        # Process whose cmdline cannot be read
+        mock_process_iter.return_value = [fake_proc(1234, 'code', error=psutil.AccessDenied(1234))]
 
         instances = detect_vscode_instances()
 
         assert len(instances) == 0
 
 
+class TestHasKiloExtension:
+    """Test the extensions directory probe."""
+
+    @pytest.mark.parametrize("names, expected", [
+        (['kilocode.kilo-code'], True),
+        (['ms-python.python-2024.1.0', 'kilocode.kilo-code-4.2.1'], True),
+        (['kilocode.kilo-codex-1.0.0'], False),
+        ([], False),
+    ])
+    def test_matches_plain_and_versioned_folders(self, tmp_path, names, expected):
+        """Test that '<id>' and '<id>-<version>' folders count as installed."""
+        for name in names:
+            (tmp_path / name).mkdir()
+
+        assert vscode.has_kilo_extension(str(tmp_path)) is expected
+
+
+class TestProcScan:
+    """Test the Linux procfs process scan."""
+
+    @staticmethod
+    def _add_process(proc_dir, pid, comm, cmdline):
+        (proc_dir / pid).mkdir()
+        (proc_dir / pid / 'comm').write_bytes(comm + b'\n')
+        (proc_dir / pid / 'cmdline').write_bytes(cmdline)
+
+    def test_reads_cmdline_of_code_processes_only(self, tmp_path):
+        """Test that only processes named code are returned, with NUL-split argv."""
+        self._add_process(tmp_path, '100', b'code', b'/usr/bin/code\0--user-data-dir\0/tmp/my data\0/ws\0')
+        self._add_process(tmp_path, '101', b'bash', b'bash\0')
+        self._add_process(tmp_path, '102', b'Code', b'')
+        (tmp_path / '103').mkdir()  # Exited before comm could be read
+        (tmp_path / 'self').mkdir()
+
+        processes = sorted(vscode._iter_proc_code_processes(str(tmp_path)))
+
+        assert processes == [(100, ['/usr/bin/code', '--user-data-dir', '/tmp/my data', '/ws']), (102, [])]
+
+    def test_rewritten_argv_is_split_on_spaces(self, tmp_path):
+        """Test cmdlines without NUL terminators are split on spaces like psutil does."""
+        self._add_process(tmp_path, '100', b'code', b'code --user-data-dir /tmp/ud')
+
+        assert list(vscode._iter_proc_code_processes(str(tmp_path))) == [(100, ['code', '--user-data-dir', '/tmp/ud'])]
+
+    def test_detect_uses_proc_dir_when_available(self, tmp_path, monkeypatch):
+        """Test that detection scans procfs without touching psutil."""
+        user_data_dir = tmp_path / 'user-data'
+        (user_data_dir / 'extensions' / 'kilocode.kilo-code').mkdir(parents=True)
+        proc_dir = tmp_path / 'proc'
+        proc_dir.mkdir()
+        self._add_process(proc_dir, '100', b'code', f'code\0--user-data-dir\0{user_data_dir}\0'.encode())
+        monkeypatch.setattr(vscode, '_PROC_DIR', str(proc_dir))
+
+        with patch('psutil.process_iter') as mock_process_iter:
+            instances = detect_vscode_instances()
+
+        assert [(i['pid'], i['user_data_dir']) for i in instances] == [(100, str(user_data_dir))]
+        mock_process_iter.assert_not_called()
+
+
+class TestParseCodeCmdline:
+    """Test _parse_code_cmdline helper."""
+
+    @pytest.mark.parametrize("cmdline, expected", [
+        (['code', '--user-data-dir', '/tmp/ud', '/ws'],
+         {'user_data_dir': '/tmp/ud', 'extensions_dir': None, 'workspace': '/ws'}),
+        (['/usr/bin/code', '--extensions-dir', '/tmp/ext', '--user-data-dir', '/tmp/ud', '--new-window', '/ws'],
+         {'user_data_dir': '/tmp/ud', 'extensions_dir': '/tmp/ext', 'workspace': '/ws'}),
+        (['code', '--user-data-dir'],
+         {'user_data_dir': None, 'extensions_dir': None, 'workspace': None}),
+        ((), {'user_data_dir': None, 'extensions_dir': None, 'workspace': None}),
+        (['code', '--user-data-dir=/tmp/my data', '--extensions-dir=/tmp/ext', '--locale=en', '/ws'],
+         {'user_data_dir': '/tmp/my data', 'extensions_dir': '/tmp/ext', 'workspace': '/ws'}),
+        (['code', '--type=utility', '--user-data-dir=/tmp/ud', '/ws'],
+         {'user_data_dir': None, 'extensions_dir': None, 'workspace': None}),
+    ])
+    def test_parse(self, cmdline, expected):
+        """Test flag values and the first positional workspace are extracted."""
+        assert _parse_code_cmdline(cmdline) == expected
+
+
 class TestGetCurrentProfileFromInstance:
     """Test get_current_profile_from_instance function."""
 
+    @pytest.fixture
+    def sample_profiles(self):
+        """Sample profiles for matching."""
+        return {
+            "test1": ModeCombinationProfile(
+                id="test1", name="Test 1", description="First", modes={"default": "model1", "code": "model2"}),
+            "test2": ModeCombinationProfile(
+                id="test2", name="Test 2", description="Second", modes={"default": "model3", "debug": "model4"}),
+        }
+
     def test_get_profile_with_matching_settings(self):
         """Test getting profile when settings match."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -136,6 +252,34 @@ class TestGetCurrentProfileFromInstance:
             # For now, just check that it returns a string or None
             assert profile_id is None or isinstance(profile_id, str)
 
+    def test_get_profile_matches_by_modes(self, sample_profiles, tmp_path):
+        """Test that settings are matched to the profile with identical modes."""
+        settings_path = tmp_path / 'User' / 'settings.json'
+        settings_path.parent.mkdir(parents=True)
+        settings_path.write_text(json.dumps({
+            'kilo-code.default.model': 'model3',
+            'kilo-code.debug.model': 'model4',
+            'editor.fontSize': 14,
+        }))
+
+        with patch('kilomoco.vscode.default_profiles', return_value=sample_profiles):
+            assert get_current_profile_from_instance({'user_data_dir': str(tmp_path)}) == 'test2'
+
+    def test_get_profile_index_follows_profile_set(self, sample_profiles, tmp_path):
+        """Test that a new profile mapping (e.g. after a cache clear) is re-indexed."""
+        settings_path = tmp_path / 'User' / 'settings.json'
+        settings_path.parent.mkdir(parents=True)
+        settings_path.write_text(json.dumps({'kilo-code.default.model': 'fresh-model'}))
+        instance = {'user_data_dir': str(tmp_path)}
+
+        with patch('kilomoco.vscode.default_profiles', return_value=sample_profiles):
+            assert get_current_profile_from_instance(instance) is None
+
+        updated = dict(sample_profiles, fresh=ModeCombinationProfile(
+            id="fresh", name="Fresh", description="Fresh", modes={"default": "fresh-model"}))
+        with patch('kilomoco.vscode.default_profiles', return_value=updated):
+            assert get_current_profile_from_instance(instance) == 'fresh'
+
     def test_get_profile_no_match(self):
         """Test getting profile when settings don't match any profile."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -157,6 +301,23 @@ class TestGetCurrentProfileFromInstance:
 
             assert profile_id is None
 
+    def test_get_profile_discovers_profiles_once(self):
+        """Test that matching many instances does not rediscover profiles each time."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            settings_path = Path(temp_dir) / 'User' / 'settings.json'
+            settings_path.parent.mkdir(parents=True)
+            settings_path.write_text(json.dumps({'kilo-code.default.model': 'unknown-model'}))
+            instance = {'user_data_dir': temp_dir}
+
+            clear_profile_caches()
+            try:
+                with patch('kilomoco.config.discover_profiles', return_value={}) as mock_discover:
+                    for _ in range(3):
+                        assert get_current_profile_from_instance(instance) is None
+                mock_discover.assert_called_once()
+            finally:
+                clear_profile_caches()
+
     def test_get_profile_no_user_data_dir(self):
         """Test getting profile when instance has no user-data-dir."""
         instance = {'workspace': '/some/path'}
@@ -190,6 +351,14 @@ class TestGetCurrentProfileFromInstance:
 
             assert profile_id is None
 
+    def test_get_profile_non_object_json(self, tmp_path):
+        """Test getting profile when settings.json is valid JSON but not an object."""
+        settings_path = tmp_path / 'User' / 'settings.json'
+        settings_path.parent.mkdir(parents=True)
+        settings_path.write_text('["kilo-code.default.model"]')
+
+        assert get_current_profile_from_instance({'user_data_dir': str(tmp_path)}) is None
+
     def test_get_profile_no_kilo_settings(self):
         """Test getting profile when settings.json has no kilo-code settings."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -206,6 +375,8 @@ class TestGetCurrentProfileFromInstance:
 
             instance = {'user_data_dir': temp_dir}
 
-            profile_id = get_current_profile_from_instance(instance)
+            with patch('kilomoco.vscode._decode_json') as mock_decode:
+                profile_id = get_current_profile_from_instance(instance)
 
-            assert profile_id is None
\ No newline at end of file
+            assert profile_id is None
+            mock_decode.assert_not_called()  # No kilo-code key, so nothing was parsed